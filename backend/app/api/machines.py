@@ -1,17 +1,33 @@
 from fastapi import APIRouter, HTTPException
-from typing import List
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from typing import List, Optional
+import asyncio
+import json
+import numpy as np
 from models.machine import Machine, MachineDataResponse
-from services.machine_service import MachineService
-from services.data_generator import DataGenerator
-from services.anomaly_detector import AnomalyDetector
-from services.llm_service import LLMService
+from services.container import machine_service, data_generator, anomaly_detector, llm_service
+from services.anomaly_detector import ANOMALY_THRESHOLD
+from services.cache import TTLCache
 
 router = APIRouter()
 
-machine_service = MachineService()
-data_generator = DataGenerator()
-anomaly_detector = AnomalyDetector()
-llm_service = LLMService()
+response_cache = TTLCache()
+
+# Dashboard polls reuse the same snapshot for a few seconds, and AI analyses are
+# reused for a minute while a machine's readings stay roughly the same
+CURRENT_DATA_TTL = 3
+AI_ANALYSIS_TTL = 60
+
+def _analysis_cache_key(machine_id: str, data) -> tuple:
+    """Quantize readings so small fluctuations map to the same cached analysis"""
+    return (
+        machine_id,
+        round(data.temperature, 0),
+        round(data.pressure, 0),
+        round(data.vibration, 1),
+        round(data.rpm, -1),
+        round(data.power_consumption, 0)
+    )
 
 @router.get("/machines", response_model=List[Machine])
 async def get_all_machines():
@@ -24,14 +40,33 @@ async def get_machine(machine_id: str):
         raise HTTPException(status_code=404, detail="Machine not found")
     return machine
 
-@router.get("/machines/data/current", response_model=List[MachineDataResponse])
+@router.get("/machines/data/current")
 async def get_current_machine_data():
-    for machine in machine_service.get_all_machines():
-        data = data_generator.generate_realistic_data(machine)
-        anomaly_score = anomaly_detector.calculate_anomaly_score(machine, data)
-        data.anomaly_score = anomaly_score
-        machine_service.update_machine_data(machine.id, data)
-    return machine_service.get_all_machine_data()
+    cached = response_cache.get("current_data")
+    if cached is not None:
+        return Response(content=cached, media_type="application/json")
+    
+    machines = machine_service.get_all_machines()
+    data_list = data_generator.generate_batch(
+        machines, machine_service.range_mins, machine_service.range_maxs, machine_service.status_thresholds
+    )
+    
+    # Score every machine in one vectorized pass
+    if data_list:
+        readings = np.array([data.metric_values() for data in data_list])
+        scores = anomaly_detector.calculate_anomaly_scores(
+            readings, machine_service.range_mins, machine_service.range_maxs,
+            machine_service.range_centers, machine_service.range_sizes
+        )
+        for data, score in zip(data_list, scores.tolist()):
+            data.anomaly_score = score
+        machine_service.update_batch([(machine.id, data) for machine, data in zip(machines, data_list)])
+    
+    # Each machine's JSON is serialized when its data is updated, so the body is just
+    # joined bytes; returning a raw Response skips response_model and jsonable_encoder
+    body = machine_service.get_all_machine_data_json()
+    response_cache.set("current_data", body, expire=CURRENT_DATA_TTL)
+    return Response(content=body, media_type="application/json")
 
 @router.get("/machines/{machine_id}/data", response_model=MachineDataResponse)
 async def get_machine_data(machine_id: str):
@@ -81,9 +116,29 @@ async def analyze_machine_anomaly(machine_id: str):
     # Calculate anomaly score if not already done
     if data.anomaly_score is None:
         data.anomaly_score = anomaly_detector.calculate_anomaly_score(machine, data)
+        machine_service.update_machine_data(machine_id, data)
     
-    # Get AI analysis
-    ai_analysis = await anomaly_detector.analyze_anomaly_with_ai(machine, data, data.anomaly_score)
+    # Get AI analysis only for anomalies, reusing a recent one for near-identical
+    # readings, or the previous one while the score stays in the same bucket with
+    # the same metrics out of range
+    ai_analysis = None
+    if data.anomaly_score >= ANOMALY_THRESHOLD:
+        cache_key = _analysis_cache_key(machine_id, data)
+        bucket_key = (round(data.anomaly_score, 1), anomaly_detector.anomaly_signature(machine, data))
+        ai_analysis = response_cache.get(cache_key)
+        if ai_analysis is None:
+            ai_analysis = machine_service.get_previous_analysis(machine_id, bucket_key)
+            if ai_analysis is None:
+                try:
+                    ai_analysis = await anomaly_detector.request_ai_analysis(machine, data, data.anomaly_score)
+                except Exception as e:
+                    # Failures get the canned analysis but are not cached, so the next request retries
+                    print(f"Error in AI analysis: {e}")
+                    ai_analysis = anomaly_detector.fallback_analysis(data.anomaly_score)
+                else:
+                    response_cache.set(cache_key, ai_analysis, expire=AI_ANALYSIS_TTL)
+                    # Stored only when freshly generated, so reuse never extends the expiry
+                    machine_service.store_analysis(machine_id, bucket_key, ai_analysis, expire=AI_ANALYSIS_TTL)
     
     # Format analysis for frontend display
     formatted_analysis = None
@@ -93,45 +148,18 @@ async def analyze_machine_anomaly(machine_id: str):
     # Create alert if warranted
     alert = anomaly_detector.create_anomaly_alert(machine, data, data.anomaly_score, ai_analysis)
     
-    return {
+    return ORJSONResponse({
         "machine_id": machine_id,
         "anomaly_score": data.anomaly_score,
         "ai_analysis": ai_analysis,
         "formatted_analysis": formatted_analysis,
         "alert_created": alert is not None,
-        "alert": alert.dict() if alert else None
-    }
+        "alert": alert.model_dump() if alert else None
+    })
 
-@router.post("/performance-report")
-async def generate_performance_report():
-    machines = machine_service.get_all_machines()
-    machine_data_list = machine_service.get_all_machine_data()
-    
-    if not machine_data_list:
-        return {"report": "No machine data available for analysis.", "error": True}
-    
-    try:
-        prompt = f"""
-        Generate a comprehensive performance report for the industrial facility with {len(machines)} machines:
-        
-        Current Status Overview:
-        """
-        
-        for machine_data in machine_data_list:
-            machine = machine_service.get_machine(machine_data.machine_id)
-            prompt += f"""
-        
-        {machine_data.name} ({machine_data.type}):
-        - Status: {machine_data.status.upper()}
-        - Anomaly Score: {machine_data.anomaly_score:.1%}
-        - Temperature: {machine_data.data['temperature']:.1f}°C
-        - Pressure: {machine_data.data['pressure']:.0f} PSI
-        - Vibration: {machine_data.data['vibration']:.2f} mm/s
-        - RPM: {machine_data.data['rpm']:.0f}
-        - Power: {machine_data.data['power_consumption']:.1f} kW
-        """
-        
-        prompt += """
+PERFORMANCE_REPORT_SYSTEM_PROMPT = "You are a senior industrial operations analyst. Provide executive reports using the exact structured format requested with proper headings and sections."
+
+PERFORMANCE_REPORT_FORMAT = """
         
         Please provide a comprehensive facility performance report in this structured format:
         
@@ -159,27 +187,129 @@ async def generate_performance_report():
         
         Keep each section concise and actionable for facility management.
         """
+
+def _machine_overview(machine_data: MachineDataResponse, summary: Optional[str] = None) -> str:
+    """Readings block for one machine in the report prompts"""
+    overview = f"""
         
-        response = anomaly_detector.client.chat.completions.create(
-            model=anomaly_detector.model,
-            messages=[
-                {"role": "system", "content": "You are a senior industrial operations analyst. Provide executive reports using the exact structured format requested with proper headings and sections."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=500,
-            temperature=0.3
-        )
+        {machine_data.name} ({machine_data.type}):
+        - Status: {machine_data.status.upper()}
+        - Anomaly Score: {machine_data.anomaly_score:.1%}
+        - Temperature: {machine_data.data['temperature']:.1f}°C
+        - Pressure: {machine_data.data['pressure']:.0f} PSI
+        - Vibration: {machine_data.data['vibration']:.2f} mm/s
+        - RPM: {machine_data.data['rpm']:.0f}
+        - Power: {machine_data.data['power_consumption']:.1f} kW"""
+    if summary:
+        overview += f"\n        - Assessment: {summary}"
+    return overview + "\n        "
+
+async def _build_performance_prompt(machine_count: int, machine_data_list: List[MachineDataResponse]) -> str:
+    """Build the facility report prompt from current machine data, with a short
+    per-machine assessment generated concurrently for each machine"""
+    summaries = await asyncio.gather(*(
+        anomaly_detector.summarize_machine(machine_data.machine_id, _machine_overview(machine_data).strip())
+        for machine_data in machine_data_list
+    ))
+    
+    parts = [f"""
+        Generate a comprehensive performance report for the industrial facility with {machine_count} machines:
         
-        # Format the response for better readability
-        raw_report = response.choices[0].message.content.strip()
-        formatted_report = llm_service.clean_text_formatting(raw_report)
-        formatted_data = llm_service.format_response_for_display(formatted_report)
+        Current Status Overview:
+        """]
+    
+    for machine_data, summary in zip(machine_data_list, summaries):
+        parts.append(_machine_overview(machine_data, summary))
+    
+    parts.append(PERFORMANCE_REPORT_FORMAT)
+    return "".join(parts)
+
+def _format_report(raw_report: str) -> dict:
+    """Clean up a generated report and split it into display sections"""
+    formatted_report = llm_service.clean_text_formatting(raw_report.strip())
+    return {
+        "report": formatted_report,
+        "formatted_data": llm_service.format_response_for_display(formatted_report)
+    }
+
+def _sse_event(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+@router.post("/performance-report")
+async def generate_performance_report():
+    machines = machine_service.get_all_machines()
+    machine_data_list = machine_service.get_all_machine_data()
+    
+    if not machine_data_list:
+        return {"report": "No machine data available for analysis.", "error": True}
+    
+    try:
+        prompt = await _build_performance_prompt(len(machines), machine_data_list)
         
-        return {
-            "report": formatted_report,
-            "formatted_data": formatted_data,
-            "timestamp": machine_data_list[0].last_updated if machine_data_list else None
-        }
+        async with anomaly_detector.ai_semaphore:
+            response = await anomaly_detector.client.chat.completions.create(
+                model=anomaly_detector.model,
+                messages=[
+                    {"role": "system", "content": PERFORMANCE_REPORT_SYSTEM_PROMPT},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=500,
+                temperature=0.3
+            )
+        
+        # Format the response for better readability
+        report = _format_report(response.choices[0].message.content)
+        report["timestamp"] = machine_data_list[0].last_updated
+        return report
         
     except Exception as e:
-        return {"report": f"Unable to generate performance report: {str(e)}", "error": True}
\ No newline at end of file
+        return {"report": f"Unable to generate performance report: {str(e)}", "error": True}
+
+@router.get("/performance-report/stream")
+async def stream_performance_report():
+    """Stream the performance report as server-sent events while it is generated"""
+    machines = machine_service.get_all_machines()
+    machine_data_list = machine_service.get_all_machine_data()
+    
+    async def events():
+        if not machine_data_list:
+            yield _sse_event({"report": "No machine data available for analysis.", "error": True, "done": True})
+            return
+        
+        # Let the client show progress while the per-machine summaries run
+        yield _sse_event({"status": f"Reviewing {len(machine_data_list)} machines..."})
+        
+        try:
+            prompt = await _build_performance_prompt(len(machines), machine_data_list)
+            chunks = []
+            
+            async with anomaly_detector.ai_semaphore:
+                stream = await anomaly_detector.client.chat.completions.create(
+                    model=anomaly_detector.model,
+                    messages=[
+                        {"role": "system", "content": PERFORMANCE_REPORT_SYSTEM_PROMPT},
+                        {"role": "user", "content": prompt}
+                    ],
+                    max_tokens=500,
+                    temperature=0.3,
+                    stream=True
+                )
+                # Forward text as it arrives so the report renders progressively; the
+                # context manager closes the upstream response if the client disconnects
+                async with stream:
+                    async for chunk in stream:
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            chunks.append(delta)
+                            yield _sse_event({"delta": delta})
+            
+            # Send the full formatted report once generation finishes
+            report = _format_report("".join(chunks))
+            report["timestamp"] = machine_data_list[0].last_updated.isoformat()
+            report["done"] = True
+            yield _sse_event(report)
+            
+        except Exception as e:
+            yield _sse_event({"report": f"Unable to generate performance report: {str(e)}", "error": True, "done": True})
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
@@ -4,6 +4,8 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 import uvicorn
 from dotenv import load_dotenv
 
@@ -11,7 +13,7 @@ load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), '..', '.env'))
 
 from api import router
 
-app = FastAPI(title="Panasonic Venture POC", version="1.0.0")
+app = FastAPI(title="Panasonic Venture POC", version="1.0.0", default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -21,6 +23,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Machine data lists repeat the same keys for every machine and compress well
+app.add_middleware(GZipMiddleware, minimum_size=512)
+
 app.include_router(router, prefix="/api")
 
 @app.get("/")
@@ -28,4 +33,10 @@ async def root():
     return {"message": "Panasonic Venture POC - Industrial Machine Monitoring"}
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    if os.getenv("DEV") == "1":
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    else:
+        # Machine data, caches and the AI call limit live in process memory, so extra
+        # workers would not share them; only opt in once state moves to a shared store
+        workers = int(os.getenv("WORKERS", "1"))
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers)
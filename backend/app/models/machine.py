@@ -1,7 +1,18 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Dict, Optional
 from datetime import datetime
 from enum import Enum
+from functools import cached_property
+import numpy as np
+
+# Order of the per-metric arrays used for vectorized scoring
+METRIC_FIELDS = ("temperature", "pressure", "vibration", "rpm", "power_consumption")
+
+# Status thresholds as multiples of the normal-range min (low) and max (high)
+CRITICAL_LOW_FACTORS = np.array([0.9, 0.8, 0.0, 0.8, 0.7])
+CRITICAL_HIGH_FACTORS = np.array([1.1, 1.2, 1.3, 1.2, 1.3])
+WARNING_LOW_FACTORS = np.array([0.95, 0.9, 0.0, 0.9, 0.85])
+WARNING_HIGH_FACTORS = np.array([1.05, 1.1, 1.1, 1.1, 1.15])
 
 class MachineType(str, Enum):
     INJECTION_MOLDING = "injection_molding"
@@ -15,10 +26,14 @@ class MachineStatus(str, Enum):
     OFFLINE = "offline"
 
 class Range(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     min: float
     max: float
 
 class NormalRanges(BaseModel):
+    model_config = ConfigDict(frozen=True)
+    
     temperature: Range
     pressure: Range
     vibration: Range
@@ -26,10 +41,47 @@ class NormalRanges(BaseModel):
     power_consumption: Range
 
 class Machine(BaseModel):
+    # Configs never change after load; nested ranges are frozen too so the
+    # cached range arrays can't go stale
+    model_config = ConfigDict(frozen=True)
+    
     id: str
     name: str
     type: MachineType
     normal_ranges: NormalRanges
+    
+    @cached_property
+    def range_mins(self) -> np.ndarray:
+        """Lower bounds of the normal ranges in METRIC_FIELDS order"""
+        return np.array([getattr(self.normal_ranges, field).min for field in METRIC_FIELDS])
+    
+    @cached_property
+    def range_maxs(self) -> np.ndarray:
+        """Upper bounds of the normal ranges in METRIC_FIELDS order"""
+        return np.array([getattr(self.normal_ranges, field).max for field in METRIC_FIELDS])
+    
+    @cached_property
+    def range_centers(self) -> np.ndarray:
+        """Midpoints of the normal ranges in METRIC_FIELDS order"""
+        return (self.range_mins + self.range_maxs) / 2
+    
+    @cached_property
+    def range_sizes(self) -> np.ndarray:
+        """Widths of the normal ranges in METRIC_FIELDS order"""
+        return self.range_maxs - self.range_mins
+    
+    @cached_property
+    def status_thresholds(self) -> np.ndarray:
+        """Rows of critical low/high and warning low/high bounds in METRIC_FIELDS order"""
+        thresholds = np.array([
+            self.range_mins * CRITICAL_LOW_FACTORS,
+            self.range_maxs * CRITICAL_HIGH_FACTORS,
+            self.range_mins * WARNING_LOW_FACTORS,
+            self.range_maxs * WARNING_HIGH_FACTORS
+        ])
+        # Vibration only has upper thresholds
+        thresholds[[0, 2], METRIC_FIELDS.index("vibration")] = -np.inf
+        return thresholds
 
 class MachineData(BaseModel):
     machine_id: str
@@ -42,6 +94,10 @@ class MachineData(BaseModel):
     status: MachineStatus
     anomaly_score: Optional[float] = None
     
+    def metric_values(self) -> np.ndarray:
+        """Current readings in METRIC_FIELDS order"""
+        return np.array([self.temperature, self.pressure, self.vibration, self.rpm, self.power_consumption])
+    
 class MachineDataResponse(BaseModel):
     machine_id: str
     name: str
@@ -1,64 +1,40 @@
 import os
+import asyncio
 from datetime import datetime
-from typing import List, Optional
-from openai import OpenAI
-from models.machine import Machine, MachineData
+from typing import List, Optional, Tuple
+from openai import AsyncOpenAI
+from models.machine import Machine, MachineData, METRIC_FIELDS
 from models.anomaly import AnomalyAlert
 from services.llm_service import LLMService
 import uuid
+import numpy as np
 
-class AnomalyDetector:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.model = "gpt-4o-mini"
-        self.llm_service = LLMService()
-        
-    def calculate_anomaly_score(self, machine: Machine, data: MachineData) -> float:
-        ranges = machine.normal_ranges
-        scores = []
-        
-        metrics = {
-            'temperature': (data.temperature, ranges.temperature),
-            'pressure': (data.pressure, ranges.pressure),
-            'vibration': (data.vibration, ranges.vibration),
-            'rpm': (data.rpm, ranges.rpm),
-            'power_consumption': (data.power_consumption, ranges.power_consumption)
-        }
-        
-        for value, range_obj in metrics.values():
-            range_size = range_obj.max - range_obj.min
-            center = (range_obj.max + range_obj.min) / 2
-            
-            if range_obj.min <= value <= range_obj.max:
-                distance_from_center = abs(value - center)
-                score = (distance_from_center / (range_size / 2)) * 0.3
-            else:
-                if value < range_obj.min:
-                    excess = range_obj.min - value
-                else:
-                    excess = value - range_obj.max
-                score = min(1.0, 0.5 + (excess / range_size))
-            
-            scores.append(score)
-        
-        return sum(scores) / len(scores)
+# Scores below this are treated as normal: no AI analysis and no alert
+ANOMALY_THRESHOLD = 0.3
+
+def _score_readings(values: np.ndarray, mins: np.ndarray, maxs: np.ndarray,
+                    centers: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    """Average per-metric anomaly score over the last axis"""
+    # Inside the range the score grows towards the edges (up to 0.3),
+    # outside it starts at 0.5 and grows with the excess (capped at 1.0)
+    inside = (values >= mins) & (values <= maxs)
+    in_range_score = np.abs(values - centers) / (sizes / 2) * 0.3
+    excess = np.where(values < mins, mins - values, values - maxs)
+    out_of_range_score = np.minimum(1.0, 0.5 + excess / sizes)
     
-    async def analyze_anomaly_with_ai(self, machine: Machine, data: MachineData, 
-                                    anomaly_score: float) -> Optional[str]:
-        if anomaly_score < 0.3:
-            return None
-            
-        try:
-            prompt = f"""
+    return np.where(inside, in_range_score, out_of_range_score).mean(axis=-1)
+
+# Anomaly analysis prompt, filled with readings and normal ranges per call
+ANALYZE_TEMPLATE = """
             Analyze this industrial machine anomaly and provide a structured response:
             
-            Machine: {machine.name} ({machine.type.value})
+            Machine: {name} ({type})
             Current readings:
-            - Temperature: {data.temperature:.1f}°C (normal: {machine.normal_ranges.temperature.min}-{machine.normal_ranges.temperature.max})
-            - Pressure: {data.pressure:.0f} PSI (normal: {machine.normal_ranges.pressure.min}-{machine.normal_ranges.pressure.max})
-            - Vibration: {data.vibration:.2f} mm/s (normal: {machine.normal_ranges.vibration.min}-{machine.normal_ranges.vibration.max})
-            - RPM: {data.rpm:.0f} (normal: {machine.normal_ranges.rpm.min}-{machine.normal_ranges.rpm.max})
-            - Power: {data.power_consumption:.1f} kW (normal: {machine.normal_ranges.power_consumption.min}-{machine.normal_ranges.power_consumption.max})
+            - Temperature: {temperature:.1f}°C (normal: {temperature_min}-{temperature_max})
+            - Pressure: {pressure:.0f} PSI (normal: {pressure_min}-{pressure_max})
+            - Vibration: {vibration:.2f} mm/s (normal: {vibration_min}-{vibration_max})
+            - RPM: {rpm:.0f} (normal: {rpm_min}-{rpm_max})
+            - Power: {power_consumption:.1f} kW (normal: {power_consumption_min}-{power_consumption_max})
             
             Anomaly Score: {anomaly_score:.2f}/1.0
             
@@ -74,30 +50,103 @@ class AnomalyDetector:
             
             Keep each section to 1-2 sentences maximum.
             """
+
+ANALYZE_SYSTEM_PROMPT = "You are an expert industrial maintenance engineer. Provide clear, structured analysis using the exact format requested."
+
+MACHINE_SUMMARY_SYSTEM_PROMPT = "You are a senior industrial operations analyst. Assess a single machine's condition and its most important concern in at most two short sentences."
+
+# Per-machine summaries only enrich the facility report, so a slow one is dropped
+# rather than retried or left to hold up the report
+SUMMARY_TIMEOUT = 10
+
+class AnomalyDetector:
+    def __init__(self, client: Optional[AsyncOpenAI] = None, llm_service: Optional[LLMService] = None):
+        self.client = client or AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.model = "gpt-4o-mini"
+        self.llm_service = llm_service or LLMService(client=self.client)
+        # Cap concurrent OpenAI requests when many analyses run at once
+        self.ai_semaphore = asyncio.Semaphore(8)
+        self.summary_client = self.client.with_options(timeout=SUMMARY_TIMEOUT, max_retries=0)
+        
+    def calculate_anomaly_score(self, machine: Machine, data: MachineData) -> float:
+        return float(_score_readings(data.metric_values(), machine.range_mins, machine.range_maxs,
+                                     machine.range_centers, machine.range_sizes))
+    
+    def calculate_anomaly_scores(self, readings: np.ndarray, mins: np.ndarray, maxs: np.ndarray,
+                                 centers: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+        """Score many machines at once from (N, 5) readings and normal-range constants"""
+        return _score_readings(readings, mins, maxs, centers, sizes)
+    
+    async def analyze_anomaly_with_ai(self, machine: Machine, data: MachineData, 
+                                    anomaly_score: float) -> Optional[str]:
+        if anomaly_score < ANOMALY_THRESHOLD:
+            return None
             
-            response = self.client.chat.completions.create(
+        try:
+            return await self.request_ai_analysis(machine, data, anomaly_score)
+        except Exception as e:
+            print(f"Error in AI analysis: {e}")
+            return self.fallback_analysis(anomaly_score)
+    
+    async def request_ai_analysis(self, machine: Machine, data: MachineData, anomaly_score: float) -> str:
+        """Ask the model for an anomaly analysis, raising if the request fails"""
+        prompt = ANALYZE_TEMPLATE.format_map(self._prompt_fields(machine, data, anomaly_score))
+        
+        async with self.ai_semaphore:
+            response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=[
-                    {"role": "system", "content": "You are an expert industrial maintenance engineer. Provide clear, structured analysis using the exact format requested."},
+                    {"role": "system", "content": ANALYZE_SYSTEM_PROMPT},
                     {"role": "user", "content": prompt}
                 ],
                 max_tokens=200,
                 temperature=0.3
             )
-            
-            # Format the response for better readability
-            raw_content = response.choices[0].message.content.strip()
-            cleaned_content = self.llm_service.clean_text_formatting(raw_content)
-            return cleaned_content
-            
+        
+        # Format the response for better readability
+        raw_content = response.choices[0].message.content.strip()
+        return self.llm_service.clean_text_formatting(raw_content)
+    
+    def fallback_analysis(self, anomaly_score: float) -> str:
+        """Canned analysis used when the AI request fails"""
+        return f"**Issue**: Anomaly detected with score {anomaly_score:.2f}\n**Action**: Manual inspection recommended."
+    
+    async def summarize_machine(self, machine_id: str, overview: str) -> Optional[str]:
+        """Short AI assessment of one machine from its readings overview"""
+        try:
+            async with self.ai_semaphore:
+                response = await self.summary_client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {"role": "system", "content": MACHINE_SUMMARY_SYSTEM_PROMPT},
+                        {"role": "user", "content": overview}
+                    ],
+                    max_tokens=80,
+                    temperature=0.3
+                )
+            return " ".join(response.choices[0].message.content.split())
         except Exception as e:
-            print(f"Error in AI analysis: {e}")
-            return f"**Issue**: Anomaly detected with score {anomaly_score:.2f}\n**Action**: Manual inspection recommended."
+            print(f"Error summarizing {machine_id}: {e}")
+            return None
+    
+    def _prompt_fields(self, machine: Machine, data: MachineData, anomaly_score: float) -> dict:
+        """Values for the ANALYZE_TEMPLATE placeholders"""
+        fields = {
+            "name": machine.name,
+            "type": machine.type.value,
+            "anomaly_score": anomaly_score
+        }
+        for metric in METRIC_FIELDS:
+            range_obj = getattr(machine.normal_ranges, metric)
+            fields[metric] = getattr(data, metric)
+            fields[f"{metric}_min"] = range_obj.min
+            fields[f"{metric}_max"] = range_obj.max
+        return fields
     
     def create_anomaly_alert(self, machine: Machine, data: MachineData, 
                            anomaly_score: float, ai_analysis: Optional[str] = None) -> Optional[AnomalyAlert]:
         """Create an anomaly alert if conditions warrant it"""
-        if anomaly_score < 0.3:  # Only create alerts for anomalies above 30%
+        if anomaly_score < ANOMALY_THRESHOLD:  # Only create alerts for anomalies above 30%
             return None
         
         # Determine severity
@@ -109,28 +158,8 @@ class AnomalyDetector:
             severity = "low"
         
         # Find which metric is most out of range
-        ranges = machine.normal_ranges
-        deviations = {
-            'temperature': self._calculate_deviation(data.temperature, ranges.temperature),
-            'pressure': self._calculate_deviation(data.pressure, ranges.pressure),
-            'vibration': self._calculate_deviation(data.vibration, ranges.vibration),
-            'rpm': self._calculate_deviation(data.rpm, ranges.rpm),
-            'power_consumption': self._calculate_deviation(data.power_consumption, ranges.power_consumption)
-        }
-        
-        worst_metric = max(deviations.items(), key=lambda x: x[1])
-        metric_name, deviation = worst_metric
-        
-        # Generate message
-        ranges_dict = {
-            'temperature': ranges.temperature,
-            'pressure': ranges.pressure,
-            'vibration': ranges.vibration,
-            'rpm': ranges.rpm,
-            'power_consumption': ranges.power_consumption
-        }
-        
-        range_obj = ranges_dict[metric_name]
+        metric_name = METRIC_FIELDS[int(np.argmax(self._calculate_deviations(machine, data)))]
+        range_obj = getattr(machine.normal_ranges, metric_name)
         value = getattr(data, metric_name)
         
         message = f"{metric_name.replace('_', ' ').title()} anomaly detected: {value:.2f} (normal: {range_obj.min}-{range_obj.max})"
@@ -147,11 +176,14 @@ class AnomalyDetector:
             ai_analysis=ai_analysis
         )
     
-    def _calculate_deviation(self, value: float, range_obj) -> float:
-        """Calculate how much a value deviates from normal range"""
-        if range_obj.min <= value <= range_obj.max:
-            return 0.0
-        elif value < range_obj.min:
-            return (range_obj.min - value) / (range_obj.max - range_obj.min)
-        else:
-            return (value - range_obj.max) / (range_obj.max - range_obj.min)
\ No newline at end of file
+    def anomaly_signature(self, machine: Machine, data: MachineData) -> Tuple[str, Tuple[str, ...]]:
+        """Worst metric and the set of out-of-range metrics, identifying what an analysis is about"""
+        deviations = self._calculate_deviations(machine, data)
+        worst = METRIC_FIELDS[int(np.argmax(deviations))]
+        return worst, tuple(field for field, deviation in zip(METRIC_FIELDS, deviations) if deviation > 0)
+    
+    def _calculate_deviations(self, machine: Machine, data: MachineData) -> np.ndarray:
+        """Calculate how far each metric is outside its normal range, relative to the range size"""
+        values = data.metric_values()
+        excess = np.maximum(machine.range_mins - values, values - machine.range_maxs)
+        return np.maximum(excess, 0.0) / machine.range_sizes
@@ -0,0 +1,33 @@
+import time
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+class TTLCache:
+    """Small in-process cache whose entries expire after a fixed number of seconds"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return the cached value, or None if missing or expired"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        return value
+
+    def set(self, key: Hashable, value: Any, expire: float):
+        """Store a value for `expire` seconds"""
+        if len(self._entries) >= self.max_entries:
+            self._prune()
+        self._entries[key] = (time.monotonic() + expire, value)
+
+    def _prune(self):
+        """Drop expired entries, and everything if the cache is still full"""
+        now = time.monotonic()
+        self._entries = {k: v for k, v in self._entries.items() if v[0] > now}
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()
@@ -0,0 +1,15 @@
+import os
+from openai import AsyncOpenAI
+from services.machine_service import MachineService
+from services.data_generator import DataGenerator
+from services.anomaly_detector import AnomalyDetector
+from services.llm_service import LLMService
+
+# Shared service instances, created once per process. A single OpenAI client
+# means one connection pool, so keep-alive connections are reused across requests.
+openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+machine_service = MachineService()
+data_generator = DataGenerator()
+llm_service = LLMService(client=openai_client)
+anomaly_detector = AnomalyDetector(client=openai_client, llm_service=llm_service)
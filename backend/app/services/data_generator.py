@@ -1,103 +1,86 @@
-import random
-import math
+import numpy as np
 from datetime import datetime
-from typing import Dict
-from models.machine import Machine, MachineData, MachineStatus
+from typing import List, Optional
+from models.machine import Machine, MachineData, MachineStatus, METRIC_FIELDS
+
+# How strongly the slow oscillation affects each metric (METRIC_FIELDS order)
+TREND_WEIGHTS = np.array([1.0, 0.5, 0.3, 0.2, 0.4])
+
+# Injected anomalies scale the range min (low) or max (high) by these factors.
+# Vibration anomalies are always high, so its low factor is unused.
+ANOMALY_LOW_FACTORS = np.array([0.5, 0.3, 0.0, 0.2, 0.1])
+ANOMALY_HIGH_FACTORS = np.array([1.6, 2.0, 3.0, 2.0, 2.5])
+VIBRATION_INDEX = METRIC_FIELDS.index("vibration")
 
 class DataGenerator:
     def __init__(self):
         self.time_offset = 0
+        self.rng = np.random.default_rng()
         
     def generate_realistic_data(self, machine: Machine) -> MachineData:
         """Generate realistic machine data based on machine type and normal ranges"""
-        ranges = machine.normal_ranges
+        return self.generate_batch([machine])[0]
+    
+    def generate_batch(self, machines: List[Machine], mins: Optional[np.ndarray] = None,
+                       maxs: Optional[np.ndarray] = None,
+                       thresholds: Optional[np.ndarray] = None) -> List[MachineData]:
+        """Generate data for several machines at once from (N, 5) normal-range bounds
+        and (N, 4, 5) status thresholds"""
+        if mins is None:
+            mins = np.array([machine.range_mins for machine in machines])
+        if maxs is None:
+            maxs = np.array([machine.range_maxs for machine in machines])
+        if thresholds is None:
+            thresholds = np.array([machine.status_thresholds for machine in machines])
+        count = len(machines)
         
         # Add some variability and trends
-        self.time_offset += 1
-        time_factor = math.sin(self.time_offset * 0.1) * 0.1  # Slow oscillation
-        noise_factor = random.uniform(-0.05, 0.05)  # Random noise
+        offsets = self.time_offset + np.arange(1, count + 1)
+        self.time_offset += count
+        time_factor = np.sin(offsets * 0.1)[:, np.newaxis] * 0.1  # Slow oscillation
+        noise_factor = self.rng.uniform(-0.05, 0.05, size=(count, 1))  # Random noise
         
-        # Generate base values within normal ranges
-        base_temp = (ranges.temperature.min + ranges.temperature.max) / 2
-        base_pressure = (ranges.pressure.min + ranges.pressure.max) / 2
-        base_vibration = (ranges.vibration.min + ranges.vibration.max) / 2
-        base_rpm = (ranges.rpm.min + ranges.rpm.max) / 2
-        base_power = (ranges.power_consumption.min + ranges.power_consumption.max) / 2
-        
-        # Apply variations
-        temperature = base_temp + (base_temp * time_factor) + (base_temp * noise_factor)
-        pressure = base_pressure + (base_pressure * time_factor * 0.5) + (base_pressure * noise_factor)
-        vibration = base_vibration + (base_vibration * time_factor * 0.3) + (base_vibration * noise_factor)
-        rpm = base_rpm + (base_rpm * time_factor * 0.2) + (base_rpm * noise_factor)
-        power_consumption = base_power + (base_power * time_factor * 0.4) + (base_power * noise_factor)
+        # Vary around the middle of the normal ranges
+        bases = (mins + maxs) / 2
+        values = bases * (1 + time_factor * TREND_WEIGHTS + noise_factor)
         
         # Frequently introduce anomalies (80% chance for demo)
-        if random.random() < 0.8:
-            anomaly_type = random.choice(['temperature', 'pressure', 'vibration', 'rpm', 'power'])
-            if anomaly_type == 'temperature':
-                temperature = random.choice([
-                    ranges.temperature.min * 0.5,  # Critically low
-                    ranges.temperature.max * 1.6   # Critically high
-                ])
-            elif anomaly_type == 'pressure':
-                pressure = random.choice([
-                    ranges.pressure.min * 0.3,  # Critically low
-                    ranges.pressure.max * 2.0   # Critically high
-                ])
-            elif anomaly_type == 'vibration':
-                vibration = ranges.vibration.max * 3.0  # Extremely high vibration
-            elif anomaly_type == 'rpm':
-                rpm = random.choice([
-                    ranges.rpm.min * 0.2,  # Critically low
-                    ranges.rpm.max * 2.0   # Critically high
-                ])
-            elif anomaly_type == 'power':
-                power_consumption = random.choice([
-                    ranges.power_consumption.min * 0.1,  # Critically low
-                    ranges.power_consumption.max * 2.5   # Critically high
-                ])
+        rows = np.flatnonzero(self.rng.random(count) < 0.8)
+        metrics = self.rng.integers(0, len(METRIC_FIELDS), size=rows.size)
+        high = (self.rng.random(rows.size) < 0.5) | (metrics == VIBRATION_INDEX)
+        values[rows, metrics] = np.where(
+            high,
+            maxs[rows, metrics] * ANOMALY_HIGH_FACTORS[metrics],  # Critically high
+            mins[rows, metrics] * ANOMALY_LOW_FACTORS[metrics]    # Critically low
+        )
         
         # Determine status based on values
-        status = self._determine_status(machine, temperature, pressure, vibration, rpm, power_consumption)
+        statuses = self._determine_status(values, thresholds)
         
-        return MachineData(
-            machine_id=machine.id,
-            timestamp=datetime.now(),
-            temperature=temperature,
-            pressure=pressure,
-            vibration=vibration,
-            rpm=rpm,
-            power_consumption=power_consumption,
-            status=status
-        )
+        timestamp = datetime.now()
+        batch = []
+        for machine, status, (temperature, pressure, vibration, rpm, power_consumption) in zip(machines, statuses, values.tolist()):
+            batch.append(MachineData(
+                machine_id=machine.id,
+                timestamp=timestamp,
+                temperature=temperature,
+                pressure=pressure,
+                vibration=vibration,
+                rpm=rpm,
+                power_consumption=power_consumption,
+                status=status
+            ))
+        return batch
     
-    def _determine_status(self, machine: Machine, temp: float, pressure: float, 
-                         vibration: float, rpm: float, power: float) -> MachineStatus:
-        """Determine machine status based on current values"""
-        ranges = machine.normal_ranges
-        
-        # Check for critical conditions
-        critical_conditions = [
-            temp < ranges.temperature.min * 0.9 or temp > ranges.temperature.max * 1.1,
-            pressure < ranges.pressure.min * 0.8 or pressure > ranges.pressure.max * 1.2,
-            vibration > ranges.vibration.max * 1.3,
-            rpm < ranges.rpm.min * 0.8 or rpm > ranges.rpm.max * 1.2,
-            power < ranges.power_consumption.min * 0.7 or power > ranges.power_consumption.max * 1.3
-        ]
+    def _determine_status(self, values: np.ndarray, thresholds: np.ndarray) -> List[MachineStatus]:
+        """Determine machine status for each row of (N, 5) values"""
+        critical_low, critical_high, warning_low, warning_high = np.moveaxis(thresholds, -2, 0)
         
-        if any(critical_conditions):
-            return MachineStatus.CRITICAL
+        # Check for critical conditions, then warning conditions
+        critical = np.any((values < critical_low) | (values > critical_high), axis=-1)
+        warning = np.any((values < warning_low) | (values > warning_high), axis=-1)
         
-        # Check for warning conditions
-        warning_conditions = [
-            temp < ranges.temperature.min * 0.95 or temp > ranges.temperature.max * 1.05,
-            pressure < ranges.pressure.min * 0.9 or pressure > ranges.pressure.max * 1.1,
-            vibration > ranges.vibration.max * 1.1,
-            rpm < ranges.rpm.min * 0.9 or rpm > ranges.rpm.max * 1.1,
-            power < ranges.power_consumption.min * 0.85 or power > ranges.power_consumption.max * 1.15
+        return [
+            MachineStatus.CRITICAL if is_critical else MachineStatus.WARNING if is_warning else MachineStatus.NORMAL
+            for is_critical, is_warning in zip(critical.tolist(), warning.tolist())
         ]
-        
-        if any(warning_conditions):
-            return MachineStatus.WARNING
-        
-        return MachineStatus.NORMAL
\ No newline at end of file
@@ -1,44 +1,44 @@
 import os
-from typing import Dict, Any
-from openai import OpenAI
+import re
+from typing import Dict, Any, Optional
+from openai import AsyncOpenAI
+
+# A line that is a "## Title" or "**Title**:" section header; like a
+# startswith("**")/endswith("**:") check, the asterisks may overlap ("**:", "***:")
+SECTION_HEADER_RE = re.compile(r'^[^\S\n]*(?:(?P<h2>##.*)|\*\*(?:\*|.*\*\*)?:)[^\S\n]*$', re.MULTILINE)
+# A line break plus any surrounding whitespace and blank lines
+LINE_BREAKS_RE = re.compile(r'\s*\n\s*')
+# A line break plus whitespace on either side of it on the same lines
+LINE_WHITESPACE_RE = re.compile(r'[^\S\n]*\n[^\S\n]*')
+BLANK_LINES_RE = re.compile(r'\n{3,}')
+# A line break between a non-empty line and a header line
+HEADER_SPACING_RE = re.compile(r'(?<=[^\n])\n(?=##|\*\*(?:\*|.*\*\*)?:$)', re.MULTILINE)
 
 class LLMService:
-    def __init__(self):
-        self.client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    def __init__(self, client: Optional[AsyncOpenAI] = None):
+        self.client = client or AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"))
         self.model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     
     def format_response_for_display(self, content: str) -> Dict[str, Any]:
         """Format AI response content for better frontend display"""
         
-        # Split into sections if using structured format
+        # Split into sections at markdown headers ("## Title" or "**Title**:" lines)
         sections = {}
         current_section = "content"
-        current_content = []
-        
-        lines = content.split('\n')
+        body_start = 0
         
-        for line in lines:
-            line = line.strip()
-            if not line:
-                continue
-                
-            # Check for section headers (markdown style)
-            if line.startswith('##'):
-                if current_content:
-                    sections[current_section] = '\n'.join(current_content).strip()
-                current_section = line.replace('##', '').strip().lower().replace(' ', '_')
-                current_content = []
-            elif line.startswith('**') and line.endswith('**:'):
-                if current_content:
-                    sections[current_section] = '\n'.join(current_content).strip()
-                current_section = line.replace('**', '').replace(':', '').strip().lower().replace(' ', '_')
-                current_content = []
+        for match in SECTION_HEADER_RE.finditer(content):
+            self._add_section(sections, current_section, content[body_start:match.start()])
+            header = match.group(0).strip()
+            if match.group("h2") is not None:
+                header = header.replace('##', '')
             else:
-                current_content.append(line)
+                header = header.replace('**', '').replace(':', '')
+            current_section = header.strip().lower().replace(' ', '_')
+            body_start = match.end()
         
         # Add the last section
-        if current_content:
-            sections[current_section] = '\n'.join(current_content).strip()
+        self._add_section(sections, current_section, content[body_start:])
         
         # If no sections were found, return as single content
         if len(sections) == 1 and "content" in sections:
@@ -55,39 +55,22 @@ class LLMService:
             "raw_content": content.strip()
         }
     
+    def _add_section(self, sections: Dict[str, str], name: str, body: str):
+        """Store a section body with lines stripped and blank lines removed"""
+        body = LINE_BREAKS_RE.sub('\n', body).strip()
+        if body:
+            sections[name] = body
+    
     def clean_text_formatting(self, text: str) -> str:
         """Clean up text formatting for better readability"""
         if not text:
             return ""
         
-        # Split into lines and clean
-        lines = [line.strip() for line in text.split('\n')]
-        
-        # Remove empty lines at start and end
-        while lines and not lines[0]:
-            lines.pop(0)
-        while lines and not lines[-1]:
-            lines.pop()
-        
-        # Process lines for better formatting
-        formatted_lines = []
-        prev_was_header = False
+        # Strip every line and drop empty lines at start and end
+        text = LINE_WHITESPACE_RE.sub('\n', text).strip()
         
-        for i, line in enumerate(lines):
-            if not line:
-                # Only add empty line if previous wasn't already empty
-                if formatted_lines and formatted_lines[-1]:
-                    formatted_lines.append("")
-                continue
-            
-            # Handle headers (## or **)
-            is_header = line.startswith('##') or (line.startswith('**') and line.endswith('**:'))
-            
-            # Add spacing before headers (except first line)
-            if is_header and formatted_lines and formatted_lines[-1]:
-                formatted_lines.append("")
-            
-            formatted_lines.append(line)
-            prev_was_header = is_header
+        # Collapse runs of empty lines into one
+        text = BLANK_LINES_RE.sub('\n\n', text)
         
-        return '\n'.join(formatted_lines)
+        # Add spacing before headers (## or **) that follow a non-empty line
+        return HEADER_SPACING_RE.sub('\n\n', text)
@@ -1,70 +1,252 @@
 import json
-import os
-from typing import List, Dict, Optional
+import logging
+import mmap
+import sys
+from functools import lru_cache
+from pathlib import Path
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+from typing import Hashable, Iterator, List, Dict, Optional, Tuple
 from datetime import datetime
-from models.machine import Machine, MachineData, MachineStatus, MachineDataResponse
+import numpy as np
+from models.machine import Machine, MachineData, MachineStatus, MachineDataResponse, METRIC_FIELDS
+from services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+CONFIG_PATH: Path = Path(__file__).resolve().parents[3] / 'config' / 'machine_configs.json'
+
+@lru_cache(maxsize=1)
+def _load_configs_cached(config_path: str) -> Dict[str, Machine]:
+    """Read, parse and validate the machine configs once per process"""
+    machines = {}
+    if not Path(config_path).is_file():
+        logger.error("Machine config file not found at %s", config_path)
+        return machines
+    try:
+        if orjson is not None:
+            # Parse straight from the mapped file pages without copying into bytes
+            with open(config_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                with memoryview(mm) as view:
+                    config = orjson.loads(view)
+        else:
+            with open(config_path, 'r') as f:
+                config = json.load(f)
+        for machine_config in config['machines']:
+            # Intern ids so every internal dict shares one canonical key string
+            machine_config['id'] = sys.intern(machine_config['id'])
+            machine = Machine(**machine_config)
+            machines[machine.id] = machine
+    except Exception:
+        logger.exception("Error loading machine configs")
+    return machines
+
+def _score_machines(temperature, pressure, vibration, rpm, power, w0, w1, w2, w3, w4, out):
+    """Weighted sum of each machine's readings, written into out"""
+    for i in range(temperature.size):
+        out[i] = w0 * temperature[i] + w1 * pressure[i] + w2 * vibration[i] + w3 * rpm[i] + w4 * power[i]
+    return out
+
+if njit is not None:
+    # Compiled loop; no fastmath because machines without data hold NaN
+    _score_machines = njit(cache=True)(_score_machines)
+
+def _build_response(machine_id, name, type_value, data):
+    """Build the API response for a machine's latest data"""
+    # Plain positional function with no per-call lookups on the service; machine
+    # and data are already validated models, so skip re-validation
+    return MachineDataResponse.model_construct(
+        machine_id=machine_id,
+        name=name,
+        type=type_value,
+        status=data.status,
+        data={
+            "temperature": data.temperature,
+            "pressure": data.pressure,
+            "vibration": data.vibration,
+            "rpm": data.rpm,
+            "power_consumption": data.power_consumption
+        },
+        anomaly_score=data.anomaly_score,
+        last_updated=data.timestamp
+    )
+
+def _dump_response(response: MachineDataResponse) -> bytes:
+    """Serialize one machine's response snapshot to JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(response.model_dump())
+    return response.model_dump_json().encode()
+
+_OFFLINE: MachineStatus = MachineStatus.OFFLINE
+
+# Compact integer codes for storing statuses in a NumPy array
+STATUS_CODES = {status: code for code, status in enumerate(MachineStatus)}
 
 class MachineService:
+    __slots__ = (
+        'machines', 'machine_data', '_response_cache', '_json_blobs', '_all_blob', '_all_dirty',
+        'last_analysis', 'get_machine', '_type_values',
+        'range_mins', 'range_maxs', 'range_centers', 'range_sizes', 'status_thresholds',
+        '_idx', '_ids', '_telemetry', '_anomaly_score', '_status', '_timestamp'
+    )
+    
     def __init__(self):
         self.machines: Dict[str, Machine] = {}
         self.machine_data: Dict[str, MachineData] = {}
+        # Response snapshot per machine, rebuilt whenever its data is updated
+        self._response_cache: Dict[str, MachineDataResponse] = {}
+        # Same snapshot pre-serialized to JSON, for the all-machines endpoint
+        self._json_blobs: Dict[str, bytes] = {}
+        self._all_blob: bytes = b"[]"
+        self._all_dirty: bool = True
+        # Each machine's last AI analysis with the key it was made for, expiring
+        # like the readings-keyed analysis cache
+        self.last_analysis = TTLCache()
         self._load_machine_configs()
+        
+        # Normal-range constants stacked as (N, 5) arrays in machine order for batch scoring
+        machines = self.machines.values()
+        self.range_mins = np.array([m.range_mins for m in machines]).reshape(-1, len(METRIC_FIELDS))
+        self.range_maxs = np.array([m.range_maxs for m in machines]).reshape(-1, len(METRIC_FIELDS))
+        self.range_centers = np.array([m.range_centers for m in machines]).reshape(-1, len(METRIC_FIELDS))
+        self.range_sizes = np.array([m.range_sizes for m in machines]).reshape(-1, len(METRIC_FIELDS))
+        self.status_thresholds = np.array([m.status_thresholds for m in machines]).reshape(-1, 4, len(METRIC_FIELDS))
+        
+        # Latest telemetry as one array per field (struct of arrays), indexed by the
+        # machine's position in config order. Machines without data hold NaN/OFFLINE.
+        count = len(self.machines)
+        self._idx: Dict[str, int] = {machine_id: i for i, machine_id in enumerate(self.machines)}
+        self._ids = np.array(list(self.machines), dtype=object)
+        self._telemetry: Dict[str, np.ndarray] = {field: np.full(count, np.nan) for field in METRIC_FIELDS}
+        self._anomaly_score = np.full(count, np.nan)
+        self._status = np.full(count, STATUS_CODES[_OFFLINE], dtype=np.int8)
+        self._timestamp = np.full(count, np.datetime64("NaT"), dtype="datetime64[ns]")
     
     def _load_machine_configs(self):
         """Load machine configurations from config file"""
-        config_path = os.path.join(os.path.dirname(__file__), '../../../config/machine_configs.json')
-        try:
-            with open(config_path, 'r') as f:
-                config = json.load(f)
-                for machine_config in config['machines']:
-                    machine = Machine(**machine_config)
-                    self.machines[machine.id] = machine
-        except FileNotFoundError:
-            print(f"Machine config file not found at {config_path}")
-        except Exception as e:
-            print(f"Error loading machine configs: {e}")
+        # Copy so per-instance changes don't leak into the shared cached dict
+        self.machines = dict(_load_configs_cached(str(CONFIG_PATH)))
+        # Memoized lookup bound to this dict; rebinding on reload drops stale entries
+        self.get_machine = lru_cache(maxsize=128)(self.machines.get)
+        # Enum values resolved once for response building
+        self._type_values: Dict[str, str] = {
+            machine_id: machine.type.value for machine_id, machine in self.machines.items()
+        }
+    
+    def iter_machines(self) -> Iterator[Machine]:
+        """Iterate over configured machines without building a list"""
+        return iter(self.machines.values())
     
     def get_all_machines(self) -> List[Machine]:
         """Get all configured machines"""
-        return list(self.machines.values())
-    
-    def get_machine(self, machine_id: str) -> Optional[Machine]:
-        """Get a specific machine by ID"""
-        return self.machines.get(machine_id)
+        return list(self.iter_machines())
     
     def update_machine_data(self, machine_id: str, data: MachineData):
         """Update machine data"""
-        self.machine_data[machine_id] = data
+        self.update_many({machine_id: data})
+    
+    def update_batch(self, pairs: List[Tuple[str, MachineData]]):
+        """Update data for several machines at once"""
+        self.update_many(dict(pairs))
+    
+    def update_many(self, items: Dict[str, MachineData]):
+        """Update data for several machines in one pass, invalidating the
+        aggregate JSON once rather than per machine"""
+        if not items:
+            return
+        # Check every id up front so an unknown one leaves all stores untouched
+        unknown = [machine_id for machine_id in items if machine_id not in self._idx]
+        if unknown:
+            raise ValueError(f"Unknown machine id(s): {', '.join(unknown)}")
+        self.machine_data.update(items)
+        machines, type_values = self.machines, self._type_values
+        for machine_id, data in items.items():
+            response = _build_response(machine_id, machines[machine_id].name, type_values[machine_id], data)
+            self._response_cache[machine_id] = response
+            self._json_blobs[machine_id] = _dump_response(response)
+        self._all_dirty = True
+        self._store_arrays(items.keys(), items.values())
+    
+    def _store_arrays(self, machine_ids, data_list):
+        """Write the latest readings into the per-field telemetry arrays"""
+        rows = [self._idx[machine_id] for machine_id in machine_ids]
+        for field, values in self._telemetry.items():
+            values[rows] = [getattr(data, field) for data in data_list]
+        self._anomaly_score[rows] = [np.nan if data.anomaly_score is None else data.anomaly_score for data in data_list]
+        self._status[rows] = [STATUS_CODES[data.status] for data in data_list]
+        self._timestamp[rows] = [data.timestamp for data in data_list]
+    
+    def get_all_machine_data_bulk(self) -> np.ndarray:
+        """Latest readings for all machines as an (N, 5) array in config order,
+        with NaN rows for machines that have no data yet"""
+        return np.stack([self._telemetry[field] for field in METRIC_FIELDS], axis=1)
+    
+    def anomalies_above(self, threshold: float) -> np.ndarray:
+        """Ids of machines whose latest anomaly score exceeds the threshold, in config order"""
+        # Unscored machines hold NaN, which never compares greater
+        return self._ids[np.flatnonzero(self._anomaly_score > threshold)]
+    
+    def status_counts(self) -> np.ndarray:
+        """Number of machines per status, indexed by STATUS_CODES"""
+        return np.bincount(self._status, minlength=len(STATUS_CODES))
+    
+    def mean_power(self) -> float:
+        """Average power consumption across machines that have reported data"""
+        power = self._telemetry["power_consumption"]
+        if np.isnan(power).all():
+            return float("nan")
+        return float(np.nanmean(power))
+    
+    def score_all(self, weights) -> np.ndarray:
+        """Weighted score of every machine's latest readings, in config order
+        (weights follow METRIC_FIELDS; NaN for machines without data)"""
+        out = np.empty(len(self._idx))
+        w0, w1, w2, w3, w4 = (float(w) for w in weights)
+        if njit is None:
+            # Without numba the NumPy expression beats a Python loop
+            return np.dot(self.get_all_machine_data_bulk(), [w0, w1, w2, w3, w4], out=out)
+        fields = [self._telemetry[field] for field in METRIC_FIELDS]
+        return _score_machines(*fields, w0, w1, w2, w3, w4, out)
     
     def get_machine_data(self, machine_id: str) -> Optional[MachineData]:
         """Get current machine data"""
         return self.machine_data.get(machine_id)
     
+    def get_previous_analysis(self, machine_id: str, analysis_key: Hashable) -> Optional[str]:
+        """Get the last AI analysis if it was made for the same analysis key
+        (score bucket and failing metrics) and has not expired"""
+        entry = self.last_analysis.get(machine_id)
+        if entry is not None and entry[0] == analysis_key:
+            return entry[1]
+        return None
+    
+    def store_analysis(self, machine_id: str, analysis_key: Hashable, ai_analysis: Optional[str], expire: float):
+        """Remember an AI analysis and the key it was made for, for `expire` seconds"""
+        self.last_analysis.set(machine_id, (analysis_key, ai_analysis), expire=expire)
+    
+    def iter_machine_data(self) -> Iterator[MachineDataResponse]:
+        """Iterate over current data for machines that have reported"""
+        yield from self._response_cache.values()
+    
     def get_all_machine_data(self) -> List[MachineDataResponse]:
         """Get current data for all machines"""
-        responses = []
-        for machine_id, machine in self.machines.items():
-            data = self.machine_data.get(machine_id)
-            if data:
-                response = MachineDataResponse(
-                    machine_id=machine_id,
-                    name=machine.name,
-                    type=machine.type.value,
-                    status=data.status,
-                    data={
-                        "temperature": data.temperature,
-                        "pressure": data.pressure,
-                        "vibration": data.vibration,
-                        "rpm": data.rpm,
-                        "power_consumption": data.power_consumption
-                    },
-                    anomaly_score=data.anomaly_score,
-                    last_updated=data.timestamp
-                )
-                responses.append(response)
-        return responses
+        return list(self.iter_machine_data())
+    
+    def get_all_machine_data_json(self) -> bytes:
+        """Current data for all machines as a ready-to-send JSON array"""
+        # Rebuilt only after a write, otherwise the memoized bytes are returned
+        if self._all_dirty:
+            self._all_blob = b"[" + b",".join(self._json_blobs.values()) + b"]"
+            self._all_dirty = False
+        return self._all_blob
     
     def get_machine_status(self, machine_id: str) -> MachineStatus:
         """Get current status of a machine"""
         data = self.machine_data.get(machine_id)
-        return data.status if data else MachineStatus.OFFLINE
\ No newline at end of file
+        return data.status if data is not None else _OFFLINE
\ No newline at end of file
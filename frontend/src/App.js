@@ -1,4 +1,4 @@
-import React, { useState, useEffect, useCallback } from 'react';
+import React, { useState, useEffect, useCallback, useRef } from 'react';
 import axios from 'axios';
 import {
   Chart as ChartJS,
@@ -22,6 +22,7 @@ function App() {
   const [analysisData, setAnalysisData] = useState(null);
   const [showPerformanceReport, setShowPerformanceReport] = useState(false);
   const [performanceReport, setPerformanceReport] = useState(null);
+  const reportStreamRef = useRef(null);
   const [criticalAlert, setCriticalAlert] = useState(null);
   const [showCriticalAlert, setShowCriticalAlert] = useState(false);
 
@@ -129,21 +130,49 @@ function App() {
     setAnalysisData(null);
   };
 
-  const generatePerformanceReport = async () => {
-    try {
-      const response = await axios.post('http://localhost:8000/api/performance-report');
-      setPerformanceReport(response.data);
-      setShowPerformanceReport(true);
-    } catch (error) {
+  const generatePerformanceReport = () => {
+    if (reportStreamRef.current) {
+      reportStreamRef.current.close();
+    }
+
+    // Stream the report so text shows up while it is being generated
+    const source = new EventSource('http://localhost:8000/api/performance-report/stream');
+    reportStreamRef.current = source;
+    let reportText = '';
+    setPerformanceReport({ report: '' });
+    setShowPerformanceReport(true);
+
+    source.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      if (message.status && !reportText) {
+        setPerformanceReport({ report: message.status });
+      }
+      if (message.delta) {
+        reportText += message.delta;
+        setPerformanceReport({ report: reportText });
+      }
+      if (message.done) {
+        source.close();
+        reportStreamRef.current = null;
+        setPerformanceReport(message);
+      }
+    };
+
+    source.onerror = () => {
+      source.close();
+      reportStreamRef.current = null;
       setPerformanceReport({
         report: 'Unable to generate performance report at this time.',
         error: true
       });
-      setShowPerformanceReport(true);
-    }
+    };
   };
 
   const closePerformanceReport = () => {
+    if (reportStreamRef.current) {
+      reportStreamRef.current.close();
+      reportStreamRef.current = null;
+    }
     setShowPerformanceReport(false);
     setPerformanceReport(null);
   };